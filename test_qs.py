@@ -1,3 +1,4 @@
+import json
 import pathlib
 
 import pytest
@@ -42,6 +43,56 @@ def test_data_attr_is_df():
     assert isinstance(q.data, pd.DataFrame)
 
 
+def _raw_records():
+    with open("data.json") as file:
+        return json.load(file)
+
+
+def test_read_line_delimited(tmp_path):
+    q = QuestionnaireAnalysis("data.json")
+    q.read_data()
+    ndjson = tmp_path / "data.ndjson"
+    ndjson.write_text("\n".join(json.dumps(record) for record in _raw_records()))
+    q_lines = QuestionnaireAnalysis(ndjson)
+    q_lines.read_data(lines=True)
+    pd.testing.assert_frame_equal(q_lines.data, q.data)
+
+
+def test_read_line_delimited_several_chunks(tmp_path, monkeypatch):
+    import hw5
+
+    monkeypatch.setattr(hw5, "_LINES_CHUNKSIZE", 7)
+    q = QuestionnaireAnalysis("data.json")
+    q.read_data()
+    ndjson = tmp_path / "data.ndjson"
+    ndjson.write_text("\n".join(json.dumps(record) for record in _raw_records()))
+    q_lines = QuestionnaireAnalysis(ndjson)
+    q_lines.read_data(lines=True)
+    pd.testing.assert_frame_equal(q_lines.data, q.data)
+
+
+def test_read_column_oriented(tmp_path):
+    q = QuestionnaireAnalysis("data.json")
+    q.read_data()
+    records = _raw_records()
+    columns = {col: [record[col] for record in records] for col in records[0]}
+    fname = tmp_path / "columns.json"
+    fname.write_text(json.dumps(columns))
+    q_columns = QuestionnaireAnalysis(fname)
+    q_columns.read_data()
+    pd.testing.assert_frame_equal(q_columns.data, q.data)
+
+
+def test_read_leading_whitespace(tmp_path):
+    q = QuestionnaireAnalysis("data.json")
+    q.read_data()
+    fname = tmp_path / "spaced.json"
+    fname.write_text(" \n" * 5000 + json.dumps(_raw_records()))
+    q_spaced = QuestionnaireAnalysis(fname)
+    q_spaced.read_data()
+    pd.testing.assert_frame_equal(q_spaced.data, q.data)
+
+
 def test_correct_age_distrib_hist():
     truth = np.load("tests_data/q1_hist.npz")
     fname = "data.json"
@@ -58,6 +109,37 @@ def test_correct_age_distrib_edges():
     assert np.array_equal(q.show_age_distrib()[1], truth["edges"])
 
 
+def test_age_distrib_chunked(tmp_path):
+    truth = np.load("tests_data/q1_hist.npz")
+    ndjson = tmp_path / "data.ndjson"
+    q = QuestionnaireAnalysis("data.json")
+    q.read_data()
+    q.data.to_json(ndjson, orient="records", lines=True)
+    q_chunks = QuestionnaireAnalysis(ndjson)
+    q_chunks.read_data(chunksize=7, lines=True)
+    assert q_chunks.data is None
+    hist, edges = q_chunks.show_age_distrib()
+    assert np.array_equal(hist, truth["hist"])
+    assert np.array_equal(edges, truth["edges"])
+
+
+def test_chunked_unsupported_analyses(tmp_path):
+    ndjson = tmp_path / "data.ndjson"
+    ndjson.write_text("\n".join(json.dumps(record) for record in _raw_records()))
+    q = QuestionnaireAnalysis(ndjson)
+    q.read_data(chunksize=10, lines=True)
+    analyses = [q.remove_rows_without_mail, q.fill_na_with_mean, q.score_subjects, q.correlate_gender_age]
+    for analysis in analyses:
+        with pytest.raises(ValueError, match="chunks"):
+            analysis()
+
+
+def test_chunked_requires_lines():
+    q = QuestionnaireAnalysis("data.json")
+    with pytest.raises(ValueError):
+        q.read_data(chunksize=10)
+
+
 def test_email_validation():
     truth = pd.read_csv("tests_data/q2_email.csv")
     fname = "data.json"
@@ -101,6 +183,17 @@ def test_score_dtype():
     assert isinstance(df["score"].dtype, pd.UInt8Dtype)
 
 
+def test_score_strict_na_dtype():
+    fname = "data.json"
+    q = QuestionnaireAnalysis(fname)
+    q.read_data()
+    df = q.score_subjects(maximal_nans_per_sub=0)
+    assert isinstance(df["score"].dtype, pd.UInt8Dtype)
+    assert df["score"].isna().sum() == q.data[["q1", "q2", "q3", "q4", "q5"]].apply(
+        pd.to_numeric, errors="coerce"
+    ).isna().any(axis=1).sum()
+
+
 def test_score_results():
     truth = pd.read_csv("tests_data/q4_score.csv", squeeze=True, index_col=0).astype(
         "UInt8"
@@ -119,3 +212,80 @@ def test_correlation():
     q.read_data()
     df = q.correlate_gender_age()
     pd.testing.assert_frame_equal(df, truth)
+
+
+def test_clean_data_timestamps():
+    fname = "data.json"
+    q = QuestionnaireAnalysis(fname)
+    q.read_data()
+    data = q.data.head(3).copy()
+    data["timestamp"] = ["2021-07-21T07:26:07Z", "2999-01-01T00:00:00Z", "not a date"]
+    data["age"] = 30
+    data["email"] = "someone@mail.com"
+    data["gender"] = "Male"
+    cleaned = q.clean_data(data)
+    assert list(cleaned.index) == [0]
+
+
+def test_analysis_keeps_data():
+    fname = "data.json"
+    q = QuestionnaireAnalysis(fname)
+    q.read_data()
+    original = q.data.copy()
+    q.fill_na_with_mean()
+    q.score_subjects()
+    q.correlate_gender_age()
+    pd.testing.assert_frame_equal(q.data, original)
+
+
+def test_question_stats_implementations_agree():
+    pytest.importorskip("numba")
+    import hw5
+
+    answers = np.array([[1.0, 2.0, np.nan, 4.0, 5.5], [np.nan] * 5, [9.9] * 5])
+    fused = hw5._question_stats_kernel(*answers.T.copy())
+    reference = hw5._question_stats_numpy(*answers.T.copy())
+    np.testing.assert_array_equal(fused[0], reference[0])
+    np.testing.assert_array_equal(fused[1], reference[1])
+    np.testing.assert_array_equal(fused[2], reference[2])
+
+
+def test_analysis_after_data_reassigned():
+    fname = "data.json"
+    q = QuestionnaireAnalysis(fname)
+    q.read_data()
+    q.score_subjects()
+    q.fill_na_with_mean()
+    q.data = q.remove_rows_without_mail()
+    fresh = QuestionnaireAnalysis(fname)
+    fresh.data = q.data.copy()
+
+    pd.testing.assert_frame_equal(q.score_subjects(), fresh.score_subjects())
+    df, rows = q.fill_na_with_mean()
+    fresh_df, fresh_rows = fresh.fill_na_with_mean()
+    pd.testing.assert_frame_equal(df, fresh_df)
+    assert np.array_equal(rows, fresh_rows)
+    pd.testing.assert_frame_equal(q.correlate_gender_age(), fresh.correlate_gender_age())
+    pd.testing.assert_frame_equal(q.clean_data(q.data), fresh.clean_data(fresh.data))
+
+
+def test_numeric_conversion_shared():
+    fname = "data.json"
+    q = QuestionnaireAnalysis(fname)
+    q.read_data()
+    questions = q._questions()
+    q.score_subjects()
+    q.correlate_gender_age()
+    assert q._questions() is questions
+    q.data = q.data.copy()
+    assert q._questions() is not questions
+
+
+def test_fillna_empty_data():
+    fname = "data.json"
+    q = QuestionnaireAnalysis(fname)
+    q.read_data()
+    q.data = q.data.iloc[:0]
+    df, rows = q.fill_na_with_mean()
+    assert df.empty
+    assert len(rows) == 0